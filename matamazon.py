@@ -1,6 +1,12 @@
 # TODO add all imports needed here
+import ast
+import heapq
+import itertools
 import json
+import operator
+import re
 import sys
+from collections import defaultdict
 
 
 # implementing the exceptions :
@@ -28,6 +34,8 @@ def validate_nonnegative_price(value, field_name="price"):
 
 
 class Customer:
+    __slots__ = ("id", "name", "city", "address")
+
     def __init__(self, id: int, name: str, city: str, address: str):
         validate_nonnegative_int(id, "id")
         self.id = id
@@ -36,14 +44,14 @@ class Customer:
         self.address = address
 
     def __repr__(self):
-        return "Customer(id={}, name='{}', city='{}', address='{}')".format(
-            self.id, self.name, self.city, self.address
-        )
+        return f"Customer(id={self.id}, name='{self.name}', city='{self.city}', address='{self.address}')"
 
     __str__ = __repr__
 
 
 class Supplier:
+    __slots__ = ("id", "name", "city", "address")
+
     def __init__(self, id: int, name: str, city: str, address: str):
         validate_nonnegative_int(id, "id")
         self.id = id
@@ -52,49 +60,65 @@ class Supplier:
         self.address = address
 
     def __repr__(self):
-        return "Supplier(id={}, name='{}', city='{}', address='{}')".format(
-            self.id, self.name, self.city, self.address
-        )
+        return f"Supplier(id={self.id}, name='{self.name}', city='{self.city}', address='{self.address}')"
 
     __str__ = __repr__
 
 
 class Product:
+    __slots__ = ("id", "name", "price", "supplier_id", "quantity", "_sort_key")
+
     def __init__(self, id: int, name: str, price: float, supplier_id: int, quantity: int):
-        validate_nonnegative_int(id, "id")
-        validate_nonnegative_int(supplier_id, "supplier_id")
-        validate_nonnegative_int(quantity, "quantity")
-        validate_nonnegative_price(price, "price")
+        # inlined fast path; the helpers only run (and raise) for unusual values
+        if type(id) is not int or id < 0:
+            validate_nonnegative_int(id, "id")
+        if type(supplier_id) is not int or supplier_id < 0:
+            validate_nonnegative_int(supplier_id, "supplier_id")
+        if type(quantity) is not int or quantity < 0:
+            validate_nonnegative_int(quantity, "quantity")
+        if (type(price) is not float and type(price) is not int) or price < 0:
+            validate_nonnegative_price(price, "price")
 
         self.id = id
         self.name = name
         self.price = float(price)
         self.supplier_id = supplier_id
         self.quantity = quantity
+        # id is the tie-breaker to make sorting deterministic
+        self._sort_key = (self.price, self.id)
 
     def __lt__(self, other):
         if not isinstance(other, Product):
             return NotImplemented
-        if self.price != other.price:
-            return self.price < other.price
-        # tie-breaker to make sorting deterministic
-        return self.id < other.id
+        return self._sort_key < other._sort_key
 
     def __repr__(self):
-        return "Product(id={}, name='{}', price={}, supplier_id={}, quantity={})".format(
-            self.id, self.name, self.price, self.supplier_id, self.quantity
+        return (
+            f"Product(id={self.id}, name='{self.name}', price={self.price}, "
+            f"supplier_id={self.supplier_id}, quantity={self.quantity})"
         )
 
     __str__ = __repr__
 
 
+_PRODUCT_SORT_KEY = operator.attrgetter("_sort_key")
+
+
 class Order:
+    __slots__ = ("id", "customer_id", "product_id", "quantity", "total_price")
+
     def __init__(self, id: int, customer_id: int, product_id: int, quantity: int, total_price: float):
-        validate_nonnegative_int(id, "id")
-        validate_nonnegative_int(customer_id, "customer_id")
-        validate_nonnegative_int(product_id, "product_id")
-        validate_nonnegative_int(quantity, "quantity")
-        validate_nonnegative_price(total_price, "total_price")
+        # inlined fast path; the helpers only run (and raise) for unusual values
+        if type(id) is not int or id < 0:
+            validate_nonnegative_int(id, "id")
+        if type(customer_id) is not int or customer_id < 0:
+            validate_nonnegative_int(customer_id, "customer_id")
+        if type(product_id) is not int or product_id < 0:
+            validate_nonnegative_int(product_id, "product_id")
+        if type(quantity) is not int or quantity < 0:
+            validate_nonnegative_int(quantity, "quantity")
+        if (type(total_price) is not float and type(total_price) is not int) or total_price < 0:
+            validate_nonnegative_price(total_price, "total_price")
 
         self.id = id
         self.customer_id = customer_id
@@ -103,13 +127,26 @@ class Order:
         self.total_price = float(total_price)
 
     def __repr__(self):
-        return "Order(id={}, customer_id={}, product_id={}, quantity={}, total_price={})".format(
-            self.id, self.customer_id, self.product_id, self.quantity, self.total_price
+        return (
+            f"Order(id={self.id}, customer_id={self.customer_id}, product_id={self.product_id}, "
+            f"quantity={self.quantity}, total_price={self.total_price})"
         )
 
     __str__ = __repr__
 
 
+# marks a missing lookup where None is a legitimate value
+_MISSING = object()
+
+# buffer size for export files, larger than the 8KB default to cut write() syscalls
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# place_order results; interned so callers may compare them by identity
+_NOPROD_MSG = sys.intern("The product does not exist in the system")
+_STOCK_MSG = sys.intern("The quantity requested for this product is greater than the quantity in stock.")
+_OK_MSG = sys.intern("The order has been accepted in the system")
+
+
 class MatamazonSystem:
     def __init__(self):
         self.customers = {}
@@ -118,6 +155,32 @@ class MatamazonSystem:
         self.orders = {}
         self.next_order_id = 1
 
+        # secondary indices: entity id -> set of order ids referencing it
+        self._orders_by_customer = defaultdict(set)
+        self._orders_by_product = defaultdict(set)
+
+        # supplier id -> set of product ids it supplies
+        self._products_by_supplier = defaultdict(set)
+
+        # inverted index: 3-gram of a product name -> set of product ids
+        self._name_trigrams = defaultdict(set)
+
+    @staticmethod
+    def _trigrams(name):
+        return {name[i:i + 3] for i in range(len(name) - 2)}
+
+    def _index_name(self, pid, name):
+        for t in self._trigrams(name):
+            self._name_trigrams[t].add(pid)
+
+    def _unindex_name(self, pid, name):
+        for t in self._trigrams(name):
+            ids = self._name_trigrams.get(t)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self._name_trigrams[t]
+
     def register_entity(self, entity, is_customer):
         validate_nonnegative_int(entity.id, "id")
 
@@ -131,6 +194,18 @@ class MatamazonSystem:
                 raise InvalidIdException("Supplier id already exists")
             self.suppliers[entity.id] = entity
 
+    def _bulk_register(self, customer_objs, supplier_objs):
+        # entities were already validated by their constructors
+        cust_map = {c.id: c for c in customer_objs}
+        if len(cust_map) != len(customer_objs) or not self.customers.keys().isdisjoint(cust_map):
+            raise InvalidIdException("Customer id already exists")
+        sup_map = {s.id: s for s in supplier_objs}
+        if len(sup_map) != len(supplier_objs) or not self.suppliers.keys().isdisjoint(sup_map):
+            raise InvalidIdException("Supplier id already exists")
+
+        self.customers.update(cust_map)
+        self.suppliers.update(sup_map)
+
     def add_or_update_product(self, product):
         # supplier must exist
         if product.supplier_id not in self.suppliers:
@@ -139,6 +214,8 @@ class MatamazonSystem:
         # new product
         if product.id not in self.products:
             self.products[product.id] = product
+            self._products_by_supplier[product.supplier_id].add(product.id)
+            self._index_name(product.id, product.name)
             return
 
         # update existing product: supplier_id cannot change
@@ -147,22 +224,29 @@ class MatamazonSystem:
             raise InvalidIdException("Cannot change supplier_id for existing product")
 
         # update fields
+        if existing.name != product.name:
+            self._unindex_name(existing.id, existing.name)
+            self._index_name(existing.id, product.name)
         existing.name = product.name
         existing.price = product.price
         existing.quantity = product.quantity
+        existing._sort_key = (existing.price, existing.id)
 
     def place_order(self, customer_id, product_id, quantity=1):
         validate_nonnegative_int(customer_id, "customer_id")
         validate_nonnegative_int(product_id, "product_id")
         validate_nonnegative_int(quantity, "quantity")
+        return self._place_order_unchecked(customer_id, product_id, quantity)
 
+    def _place_order_unchecked(self, customer_id, product_id, quantity):
+        # caller guarantees all arguments are non-negative ints
         if product_id not in self.products:
-            return "The product does not exist in the system"
+            return _NOPROD_MSG
 
         product = self.products[product_id]
 
         if quantity > product.quantity:
-            return "The quantity requested for this product is greater than the quantity in stock."
+            return _STOCK_MSG
 
         product.quantity -= quantity
 
@@ -172,72 +256,83 @@ class MatamazonSystem:
         total_price = product.price * quantity
         order = Order(order_id, customer_id, product_id, quantity, total_price)
         self.orders[order_id] = order
+        self._orders_by_customer[customer_id].add(order_id)
+        self._orders_by_product[product_id].add(order_id)
+
+        return _OK_MSG
+
+    def _remove_order(self, _id):
+        if _id not in self.orders:
+            raise InvalidIdException("Order id does not exist: {}".format(_id))
+        order = self.orders.pop(_id)
+        self._orders_by_customer[order.customer_id].discard(_id)
+        self._orders_by_product[order.product_id].discard(_id)
+
+        # restore stock
+        p = self.products.get(order.product_id)
+        if p is not None:
+            p.quantity += order.quantity
+        return order.quantity
+
+    def _remove_customer(self, _id):
+        if _id not in self.customers:
+            raise InvalidIdException("Customer id does not exist: {}".format(_id))
+        if self._orders_by_customer.get(_id):
+            raise InvalidIdException("Cannot remove customer with existing orders: {}".format(_id))
+        del self.customers[_id]
+        return None
 
-        return "The order has been accepted in the system"
-
-    def remove_object(self, _id, class_type):
-        validate_nonnegative_int(_id, "id")
-        ct = str(class_type).strip().lower()
-
-        def has_order_with_customer(cid):
-            for o in self.orders.values():
-                if o.customer_id == cid:
-                    return True
-            return False
-
-        def has_order_with_product(pid):
-            for o in self.orders.values():
-                if o.product_id == pid:
-                    return True
-            return False
-
-        def has_order_with_supplier(sid):
-            for o in self.orders.values():
-                p = self.products.get(o.product_id)
-                if p is not None and p.supplier_id == sid:
-                    return True
-            return False
-
-        if ct == "order":
-            if _id not in self.orders:
-                raise InvalidIdException("Order id does not exist: {}".format(_id))
-            order = self.orders.pop(_id)
-
-            # restore stock
-            p = self.products.get(order.product_id)
-            if p is not None:
-                p.quantity += order.quantity
-            return order.quantity
-
-        if ct == "customer":
-            if _id not in self.customers:
-                raise InvalidIdException("Customer id does not exist: {}".format(_id))
-            if has_order_with_customer(_id):
-                raise InvalidIdException("Cannot remove customer with existing orders: {}".format(_id))
-            del self.customers[_id]
-            return None
+    def _remove_product(self, _id):
+        if _id not in self.products:
+            raise InvalidIdException("Product id does not exist: {}".format(_id))
+        if self._orders_by_product.get(_id):
+            raise InvalidIdException("Cannot remove product with existing orders: {}".format(_id))
+        existing = self.products.pop(_id)
+        self._products_by_supplier[existing.supplier_id].discard(_id)
+        self._unindex_name(_id, existing.name)
+        return None
 
-        if ct == "product":
-            if _id not in self.products:
-                raise InvalidIdException("Product id does not exist: {}".format(_id))
-            if has_order_with_product(_id):
-                raise InvalidIdException("Cannot remove product with existing orders: {}".format(_id))
-            del self.products[_id]
-            return None
+    def _remove_supplier(self, _id):
+        if _id not in self.suppliers:
+            raise InvalidIdException("Supplier id does not exist: {}".format(_id))
+        if any(self._orders_by_product.get(pid) for pid in self._products_by_supplier.get(_id, ())):
+            raise InvalidIdException("Cannot remove supplier with existing orders: {}".format(_id))
+        del self.suppliers[_id]
+        return None
 
-        if ct == "supplier":
-            if _id not in self.suppliers:
-                raise InvalidIdException("Supplier id does not exist: {}".format(_id))
-            if has_order_with_supplier(_id):
-                raise InvalidIdException("Cannot remove supplier with existing orders: {}".format(_id))
-            del self.suppliers[_id]
-            return None
+    # class_type -> remover; common spellings are listed so they skip normalization
+    _REMOVERS = {
+        variant: remover
+        for name, remover in (
+            ("order", _remove_order),
+            ("customer", _remove_customer),
+            ("product", _remove_product),
+            ("supplier", _remove_supplier),
+        )
+        for variant in (name, name.capitalize(), name.upper())
+    }
 
-        raise InvalidIdException("Invalid class_type: {}".format(class_type))
+    def remove_object(self, _id, class_type):
+        validate_nonnegative_int(_id, "id")
+        remover = self._REMOVERS.get(class_type) if isinstance(class_type, str) else None
+        if remover is None:
+            remover = self._REMOVERS.get(str(class_type).strip().lower())
+            if remover is None:
+                raise InvalidIdException("Invalid class_type: {}".format(class_type))
+        return remover(self, _id)
+
+    def search_products(self, query, max_price=None, limit=None):
+        qgrams = self._trigrams(query)
+        if qgrams:
+            # only products sharing every 3-gram of the query can contain it
+            candidates = set.intersection(*[self._name_trigrams.get(t, set()) for t in qgrams])
+            pool = [self.products[pid] for pid in candidates]
+        else:
+            # queries shorter than 3 chars cannot use the index
+            pool = self.products.values()
 
-    def search_products(self, query, max_price=None):
         res = []
-        for p in self.products.values():
+        for p in pool:
             if p.quantity == 0:
                 continue
             if query not in p.name:
@@ -246,33 +341,113 @@ class MatamazonSystem:
                 continue
             res.append(p)
 
-        return sorted(res)
+        # only the first `limit` results are needed -> partial heap selection
+        if limit is not None:
+            # negative limits are clamped, so 0 or less means no results
+            return heapq.nsmallest(max(limit, 0), res, key=_PRODUCT_SORT_KEY)
+        return sorted(res, key=_PRODUCT_SORT_KEY)
 
     def export_system_to_file(self, path):
-        with open(path, "w", encoding="utf-8") as f:
-            for c in self.customers.values():
-                print(c, file=f)
-            for s in self.suppliers.values():
-                print(s, file=f)
-            for p in self.products.values():
-                print(p, file=f)
+        entities = itertools.chain(self.customers.values(), self.suppliers.values(), self.products.values())
+        # one line per entity, written in a single call
+        data = "\n".join(map(repr, entities))
+        with open(path, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as f:
+            if data:
+                # separate writes, so the export string is not copied just to append a newline
+                f.write(data)
+                f.write("\n")
 
     def export_orders(self, out_file):
-        grouped = {}
-        for o in self.orders.values():
-            p = self.products.get(o.product_id)
-            if p is None:
-                continue
+        # resolve each product's supplier city once instead of once per order
+        city_of = {}
+        for pid, p in self.products.items():
             s = self.suppliers.get(p.supplier_id)
-            if s is None:
+            if s is not None:
+                city_of[pid] = s.city
+
+        grouped = defaultdict(list)
+        for o in self.orders.values():
+            city = city_of.get(o.product_id, _MISSING)
+            if city is _MISSING:
                 continue
+            grouped[city].append(repr(o))
+
+        # json.dumps goes through the C encoder in one shot; json.dump encodes chunk by chunk in Python
+        out_file.write(json.dumps(grouped))
+
+
+_LINE_RE = re.compile(r"(Customer|Supplier|Product|Order)\s*\(")
+
+_CONSTRUCTORS = {
+    "Customer": Customer,
+    "Supplier": Supplier,
+    "Product": Product,
+    "Order": Order,
+}
+
+
+# exact repr formats, as written by export_system_to_file; only values whose int()/float()
+# reading matches the Python literal are accepted, anything else goes through ast
+_INT = r"(-?(?:0|[1-9][0-9]*))"
+_FLOAT = r"(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)"
+_STR = r"'([^'\\]*)'"
+
+_FAST_LINE_FORMATS = {
+    "Customer": (
+        re.compile(r"Customer\(id={}, name={}, city={}, address={}\)$".format(_INT, _STR, _STR, _STR)),
+        (int, str, str, str),
+    ),
+    "Supplier": (
+        re.compile(r"Supplier\(id={}, name={}, city={}, address={}\)$".format(_INT, _STR, _STR, _STR)),
+        (int, str, str, str),
+    ),
+    "Product": (
+        re.compile(
+            r"Product\(id={}, name={}, price={}, supplier_id={}, quantity={}\)$".format(_INT, _STR, _FLOAT, _INT, _INT)
+        ),
+        (int, str, float, int, int),
+    ),
+    "Order": (
+        re.compile(
+            r"Order\(id={}, customer_id={}, product_id={}, quantity={}, total_price={}\)$".format(
+                _INT, _INT, _INT, _INT, _FLOAT
+            )
+        ),
+        (int, int, int, int, float),
+    ),
+}
+
+
+def _parse_entity_line(line):
+    # parse a single "Ctor(arg, key=value, ...)" line without compiling/executing it;
+    # returns None for illegal lines
+    m = _LINE_RE.match(line)
+    if m is None:
+        return None
+    ctor = m.group(1)
 
-            city = s.city
-            if city not in grouped:
-                grouped[city] = []
-            grouped[city].append(str(o))
+    # fast path: the fixed repr format, read with one regex match
+    regex, converters = _FAST_LINE_FORMATS[ctor]
+    fm = regex.match(line)
+    if fm is not None:
+        # constructor exceptions are intentionally not caught here
+        return _CONSTRUCTORS[ctor](*[conv(v) for conv, v in zip(converters, fm.groups())])
+
+    try:
+        call = ast.parse(line, mode="eval").body
+        if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name) or call.func.id != ctor:
+            return None
+        args = [ast.literal_eval(a) for a in call.args]
+        kwargs = {k.arg: ast.literal_eval(k.value) for k in call.keywords}
+    except (SyntaxError, ValueError):
+        # includes non-literal arguments such as bare names or calls
+        return None
+    if None in kwargs:
+        # **kwargs unpacking is not a literal
+        return None
 
-        json.dump(grouped, out_file)
+    # constructor exceptions are intentionally not caught here
+    return _CONSTRUCTORS[ctor](*args, **kwargs)
 
 
 def load_system_from_file(path):
@@ -282,24 +457,14 @@ def load_system_from_file(path):
     suppliers = []
     products = []
 
-    safe_globals = {
-        "Customer": Customer,
-        "Supplier": Supplier,
-        "Product": Product,
-        "Order": Order,
-        "InvalidIdException": InvalidIdException,
-        "InvalidPriceException": InvalidPriceException,
-    }
-
     with open(path, "r", encoding="utf-8") as f:
         for raw in f:
             line = raw.strip()
             if not line:
                 continue
 
-            try:
-                obj = eval(line, safe_globals, {})
-            except (SyntaxError, NameError):
+            obj = _parse_entity_line(line)
+            if obj is None:
                 # illegal lines may be ignored
                 continue
 
@@ -314,10 +479,7 @@ def load_system_from_file(path):
                 continue
 
     # register entities first, then products
-    for c in customers:
-        sys_obj.register_entity(c, True)
-    for s in suppliers:
-        sys_obj.register_entity(s, False)
+    sys_obj._bulk_register(customers, suppliers)
     for p in products:
         sys_obj.add_or_update_product(p)
 
@@ -327,18 +489,20 @@ def load_system_from_file(path):
 USAGE_MSG = "Usage: python3 matamazon.py -l < matamazon_log > -s < matamazon_system > -o <output_file> -os <out_matamazon_system>"
 
 
+_SCRIPT_FLAGS = frozenset(("-l", "-s", "-o", "-os"))
+
+
 def _parse_script_args(argv):
-    allowed = {"-l", "-s", "-o", "-os"}
     args = {}
     i = 1
     while i < len(argv):
         flag = argv[i]
-        if flag not in allowed:
+        if flag not in _SCRIPT_FLAGS:
             return None
         if i + 1 >= len(argv):
             return None
         val = argv[i + 1]
-        if val in allowed:
+        if val in _SCRIPT_FLAGS:
             return None
         args[flag] = val
         i += 2
@@ -351,6 +515,94 @@ def _decode_token(tok: str) -> str:
     return tok.replace("_", " ")
 
 
+# log command handlers: each takes the system and the split log line
+def _handle_register(system, parts):
+    who = parts[1].lower()
+    _id = int(parts[2])
+    name = _decode_token(parts[3])
+    city = _decode_token(parts[4])
+    address = _decode_token(parts[5])
+    if who == "customer":
+        system.register_entity(Customer(_id, name, city, address), True)
+    else:
+        system.register_entity(Supplier(_id, name, city, address), False)
+
+
+def _handle_add(system, parts):
+    pid = int(parts[1])
+    name = _decode_token(parts[2])
+    price = float(parts[3])
+    sid = int(parts[4])
+    qty = int(parts[5])
+    system.add_or_update_product(Product(pid, name, price, sid, qty))
+
+
+def _handle_order(system, parts):
+    cid = int(parts[1])
+    pid = int(parts[2])
+    qty = int(parts[3]) if len(parts) >= 4 else 1
+    if cid >= 0 and pid >= 0 and qty >= 0:
+        system._place_order_unchecked(cid, pid, qty)
+    else:
+        # let the validating entry point raise the proper error
+        system.place_order(cid, pid, qty)
+
+
+def _handle_remove(system, parts):
+    # Log format is: remove <ClassType> <id>
+    # (Some implementations accidentally swap order; support both.)
+    if len(parts) < 3:
+        raise ValueError("Bad remove command")
+
+    # If parts[1] is numeric -> assume remove <id> <ClassType>
+    # else assume remove <ClassType> <id>
+    if parts[1].lstrip("-").isdigit():
+        _id = int(parts[1])
+        class_type = parts[2]
+    else:
+        class_type = parts[1]
+        _id = int(parts[2])
+
+    system.remove_object(_id, class_type)
+
+
+def _handle_search(system, parts):
+    query = _decode_token(parts[1])
+    # a fourth token is only a limit when it is a plain non-negative integer,
+    # anything else is ignored as before
+    if len(parts) >= 4 and parts[3].isdecimal():
+        max_price = float(parts[2])
+        limit = int(parts[3])
+        res = system.search_products(query, max_price, limit)
+    elif len(parts) >= 3:
+        max_price = float(parts[2])
+        res = system.search_products(query, max_price)
+    else:
+        res = system.search_products(query)
+    print(res)
+
+
+HANDLERS = {
+    "register": _handle_register,
+    "add": _handle_add,
+    "update": _handle_add,
+    "order": _handle_order,
+    "remove": _handle_remove,
+    "search": _handle_search,
+}
+
+
+def _iter_log_commands(path):
+    # yields the whitespace-split tokens of every non-blank line; text mode handles
+    # universal newlines and non-regular files such as pipes
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # split() already drops surrounding whitespace, no strip() copy needed
+            parts = line.split()
+            if parts:
+                yield parts
+
+
 def main():
     parsed = _parse_script_args(sys.argv)
     if parsed is None:
@@ -363,67 +615,14 @@ def main():
         else:
             system = MatamazonSystem()
 
-        with open(parsed["-l"], "r", encoding="utf-8") as logf:
-            for raw in logf:
-                line = raw.strip()
-                if not line:
-                    continue
-                parts = line.split()
-                cmd = parts[0]
-
-                if cmd == "register":
-                    who = parts[1].lower()
-                    _id = int(parts[2])
-                    name = _decode_token(parts[3])
-                    city = _decode_token(parts[4])
-                    address = _decode_token(parts[5])
-                    if who == "customer":
-                        system.register_entity(Customer(_id, name, city, address), True)
-                    else:
-                        system.register_entity(Supplier(_id, name, city, address), False)
-
-                elif cmd == "add" or cmd == "update":
-                    pid = int(parts[1])
-                    name = _decode_token(parts[2])
-                    price = float(parts[3])
-                    sid = int(parts[4])
-                    qty = int(parts[5])
-                    system.add_or_update_product(Product(pid, name, price, sid, qty))
-
-                elif cmd == "order":
-                    cid = int(parts[1])
-                    pid = int(parts[2])
-                    qty = int(parts[3]) if len(parts) >= 4 else 1
-                    system.place_order(cid, pid, qty)
-
-                elif cmd == "remove":
-                    # Log format is: remove <ClassType> <id>
-                    # (Some implementations accidentally swap order; support both.)
-                    if len(parts) < 3:
-                        raise ValueError("Bad remove command")
-
-                    # If parts[1] is numeric -> assume remove <id> <ClassType>
-                    # else assume remove <ClassType> <id>
-                    if parts[1].lstrip("-").isdigit():
-                        _id = int(parts[1])
-                        class_type = parts[2]
-                    else:
-                        class_type = parts[1]
-                        _id = int(parts[2])
-
-                    system.remove_object(_id, class_type)
-
-                elif cmd == "search":
-                    query = _decode_token(parts[1])
-                    if len(parts) >= 3:
-                        max_price = float(parts[2])
-                        res = system.search_products(query, max_price)
-                    else:
-                        res = system.search_products(query)
-                    print(res)
+        handlers_get = HANDLERS.get
+        for parts in _iter_log_commands(parsed["-l"]):
+            handler = handlers_get(parts[0])
+            if handler is not None:
+                handler(system, parts)
 
         if "-o" in parsed:
-            with open(parsed["-o"], "w", encoding="utf-8") as out_orders:
+            with open(parsed["-o"], "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as out_orders:
                 system.export_orders(out_orders)
         else:
             system.export_orders(sys.stdout)